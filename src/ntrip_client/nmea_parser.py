@@ -2,7 +2,18 @@ import logging
 
 NMEA_DEFAULT_MAX_LENGTH = 82
 NMEA_DEFAULT_MIN_LENGTH = 3
-_NMEA_CHECKSUM_SEPERATOR = "*"
+_NMEA_START_BYTES = frozenset(b"$!")
+_NMEA_CHECKSUM_SEPERATOR = b"*"
+_NMEA_HEX_LOOKUP = [int(chr(i), 16) if chr(i) in '0123456789abcdefABCDEF' else -1 for i in range(256)]
+
+def _nmea_checksum(payload):
+  # Treat the whole payload as one integer padded with zeros to a power of two bytes, and XOR the top half onto the bottom half until only one byte is left
+  checksum = int.from_bytes(payload, 'little')
+  shift = 4 << (len(payload) - 1).bit_length()
+  while shift >= 8:
+    checksum ^= checksum >> shift
+    shift >>= 1
+  return checksum & 0xFF
 
 class NMEAParser:
 
@@ -18,34 +29,32 @@ class NMEAParser:
     self.nmea_min_length = NMEA_DEFAULT_MIN_LENGTH
 
   def is_valid_sentence(self, sentence):
+    # Sentence is expected to already be encoded as bytes, so we only have to walk the data once
     # Simple sanity checks
     if len(sentence) > self.nmea_max_length:
-      self._logwarn('Received invalid NMEA sentence. Max length is {}, but sentence was {} bytes'.format(self.nmea_max_length, len(sentence)))
-      self._logwarn('Sentence: {}'.format(sentence))
+      self._warn_invalid(sentence, 'Max length is {}, but sentence was {} bytes', self.nmea_max_length, len(sentence))
       return False
     if len(sentence) < self.nmea_min_length:
-      self._logwarn('Received invalid NMEA sentence. We need at least {} bytes to parse but got {} bytes'.format(self.nmea_min_length, len(sentence)))
-      self._logwarn('Sentence: {}'.format(sentence))
+      self._warn_invalid(sentence, 'We need at least {} bytes to parse but got {} bytes', self.nmea_min_length, len(sentence))
       return False
-    if sentence[0] != '$' and sentence[0] != '!':
-      self._logwarn('Received invalid NMEA sentence. Sentence should begin with "$" or "!", but instead begins with {}'.format(sentence[0]))
-      self._logwarn('Sentence: {}'.format(sentence))
+    if not sentence.endswith(b'\r\n'):
+      self._warn_invalid(sentence, 'Sentence should end with \\r\\n, but instead ends with {}', sentence[-2:])
       return False
-    if sentence[-2:] != '\r\n':
-      self._logwarn('Received invalid NMEA sentence. Sentence should end with \\r\\n, but instead ends with {}'.format(sentence[-2:]))
-      self._logwarn('Sentence: {}'.format(sentence))
+    if sentence[0] not in _NMEA_START_BYTES:  # safe to index, the check above means there are at least two bytes
+      self._warn_invalid(sentence, 'Sentence should begin with "$" or "!", but instead begins with {}', sentence[:1])
       return False
-    if _NMEA_CHECKSUM_SEPERATOR not in sentence:
-      self._logwarn('Received invalid NMEA sentence. Sentence should have a "{}" character to seperate the checksum, but we could not find it.'.format(_NMEA_CHECKSUM_SEPERATOR))
-      self._logwarn('Sentence: {}'.format(sentence))
+    # The checksum is always two hex digits between the separator and the \r\n, so we know exactly where the separator has to be without searching for it
+    seperator_index = len(sentence) - 5
+    if sentence[seperator_index:seperator_index + 1] != _NMEA_CHECKSUM_SEPERATOR:
+      self._warn_invalid(sentence, 'Sentence should have a "*" character followed by a two character checksum before the \\r\\n, but we could not find it.')
       return False
 
     # Checksum check
-    data, expected_checksum_str = sentence.rsplit(_NMEA_CHECKSUM_SEPERATOR, 1)
-    expected_checksum = int(expected_checksum_str, 16)
-    calculated_checksum = 0
-    for char in data[1:]:
-      calculated_checksum ^= ord(char)
+    expected_checksum = _NMEA_HEX_LOOKUP[sentence[seperator_index + 1]] << 4 | _NMEA_HEX_LOOKUP[sentence[seperator_index + 2]]
+    if expected_checksum < 0:
+      self._warn_invalid(sentence, 'Checksum should be hexadecimal, but was {}', sentence[seperator_index + 1:seperator_index + 3])
+      return False
+    calculated_checksum = _nmea_checksum(sentence[1:seperator_index])
     if expected_checksum != calculated_checksum:
       self._logwarn('Received invalid NMEA sentence. Checksum mismatch');
       self._logwarn('Expected Checksum:   0x{:X}'.format(expected_checksum))
@@ -54,3 +63,8 @@ class NMEAParser:
 
     # Passed all checks
     return True
+
+  def _warn_invalid(self, sentence, reason, *args):
+    # Only format the message and decode the sentence once we know we are going to log it
+    self._logwarn('Received invalid NMEA sentence. ' + reason.format(*args))
+    self._logwarn('Sentence: {}'.format(sentence.decode('utf-8', errors='replace')))
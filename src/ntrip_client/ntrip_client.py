@@ -1,27 +1,33 @@
 #!/usr/bin/env python
 
+import re
 import ssl
 import time
 import base64
 import socket
-import select
 import logging
 
 from .nmea_parser import NMEAParser
 from .rtcm_parser import RTCMParser
 
-_CHUNK_SIZE = 1024
+_CHUNK_SIZE = 1024 * 16
+_RECV_BUFFER_SIZE = 1024 * 64
 _SOURCETABLE_RESPONSES = [
-  'SOURCETABLE 200 OK'
+  b'SOURCETABLE 200 OK'
 ]
 _SUCCESS_RESPONSES = [
-  'ICY 200 OK',
-  'HTTP/1.0 200 OK',
-  'HTTP/1.1 200 OK'
+  b'ICY 200 OK',
+  b'HTTP/1.0 200 OK',
+  b'HTTP/1.1 200 OK'
 ]
 _UNAUTHORIZED_RESPONSES = [
-  '401'
+  b'401'
 ]
+_RESPONSE_PATTERN = re.compile(b'(?P<success>%b)|(?P<sourcetable>%b)|(?P<unauthorized>%b)' % (
+  b'|'.join(re.escape(response) for response in _SUCCESS_RESPONSES),
+  b'|'.join(re.escape(response) for response in _SOURCETABLE_RESPONSES),
+  b'|'.join(re.escape(response) for response in _UNAUTHORIZED_RESPONSES)
+))
 
 class NTRIPClient:
 
@@ -48,6 +54,9 @@ class NTRIPClient:
     else:
       self._basic_credentials = None
 
+    # None of the server info changes after construction, so the request only needs to be formed once
+    self._request_bytes = self._form_request()
+
     # Initialize this so we don't throw an exception when closing
     self._raw_socket = None
     self._server_socket = None
@@ -83,7 +92,11 @@ class NTRIPClient:
     self._read_zero_bytes_count = 0
     self._read_zero_bytes_max = 5
     self._first_rtcm_received = False
-    self._recv_rtcm_last_packet_timestamp = 0
+    self._recv_rtcm_last_packet_ns = 0
+
+    # Buffer that RTCM is read into, reused between reads so we don't allocate every time we read from the socket
+    self._recv_buffer = bytearray(_RECV_BUFFER_SIZE)
+    self._recv_buffer_view = memoryview(self._recv_buffer)
 
     # Public reconnect info
     self.reconnect_attempt_max = self.DEFAULT_RECONNECT_ATTEMPT_MAX
@@ -119,7 +132,7 @@ class NTRIPClient:
 
     # Send the HTTP Request
     try:
-      self._server_socket.send(self._form_request())
+      self._server_socket.sendall(self._request_bytes)
     except Exception as e:
       self._logerr(
         'Unable to send request to server at http://{}:{}'.format(self._host, self._port))
@@ -127,25 +140,28 @@ class NTRIPClient:
       return False
 
     # Get the response from the server
-    response = ''
+    response = b''
     try:
-      response = self._server_socket.recv(_CHUNK_SIZE).decode('ISO-8859-1')
+      response = self._server_socket.recv(_CHUNK_SIZE)
     except Exception as e:
       self._logerr(
         'Unable to read response from server at http://{}:{}'.format(self._host, self._port))
       self._logerr('Exception: {}'.format(str(e)))
       return False
 
+    # Find every kind of response the server sent in a single pass over the response
+    response_types = set(match.lastgroup for match in _RESPONSE_PATTERN.finditer(response))
+
     # Properly handle the response
-    if any(success in response for success in _SUCCESS_RESPONSES):
+    if 'success' in response_types:
       self._connected = True
 
     # Some debugging hints about the kind of error we received
     known_error = False
-    if any(sourcetable in response for sourcetable in _SOURCETABLE_RESPONSES):
+    if 'sourcetable' in response_types:
       self._logwarn('Received sourcetable response from the server. This probably means the mountpoint specified is not valid')
       known_error = True
-    elif any(unauthorized in response for unauthorized in _UNAUTHORIZED_RESPONSES):
+    elif 'unauthorized' in response_types:
       self._logwarn('Received unauthorized response from the server. Check your username, password, and mountpoint to make sure they are correct.')
       known_error = True
     elif not self._connected and (self._ntrip_version == None or self._ntrip_version == ''):
@@ -157,11 +173,14 @@ class NTRIPClient:
     if known_error or not self._connected:
       self._logerr('Invalid response received from http://{}:{}/{}'.format(
         self._host, self._port, self._mountpoint))
-      self._logerr('Response: {}'.format(response))
+      self._logerr('Response: {}'.format(response.decode('ISO-8859-1')))
       return False
     else:
       self._loginfo(
         'Connected to http://{}:{}/{}'.format(self._host, self._port, self._mountpoint))
+
+      # From now on, reads should return whatever is available instead of waiting for data. See recv_rtcm
+      self._server_socket.setblocking(False)
       return True
 
 
@@ -209,29 +228,35 @@ class NTRIPClient:
       self._logwarn('NMEA sent before client was connected, discarding NMEA')
       return
 
+    # Encode the data once up front, everything after this works on the bytes. This also means the retry below does not encode again
+    if isinstance(sentence, str):
+      sentence = sentence.encode('utf-8')
+
     # Not sure if this is the right thing to do, but python will escape the return characters at the end of the string, so do this manually
-    if sentence[-4:] == '\\r\\n':
-      sentence = sentence[:-4] + '\r\n'
-    elif sentence[-2:] != '\r\n':
-      sentence = sentence + '\r\n'
+    if sentence[-4:] == b'\\r\\n':
+      sentence = sentence[:-4] + b'\r\n'
+    elif sentence[-2:] != b'\r\n':
+      sentence = sentence + b'\r\n'
 
     # Check if it is a valid NMEA sentence
     if not self.nmea_parser.is_valid_sentence(sentence):
       self._logwarn("Invalid NMEA sentence, not sending to server")
       return
 
-    # Encode the data and send it to the socket
-    try:
-      self._server_socket.send(sentence.encode('utf-8'))
-    except Exception as e:
-      self._logwarn('Unable to send NMEA sentence to server.')
-      self._logwarn('Exception: {}'.format(str(e)))
-      self._nmea_send_failed_count += 1
-      if self._nmea_send_failed_count >= self._nmea_send_failed_max:
+    # Send the encoded data to the socket. If we have to reconnect, try sending the NMEA sentence one more time
+    for attempt in range(2):
+      try:
+        self._server_socket.sendall(sentence)
+        return
+      except Exception as e:
+        self._logwarn('Unable to send NMEA sentence to server.')
+        self._logwarn('Exception: {}'.format(str(e)))
+        self._nmea_send_failed_count += 1
+        if self._nmea_send_failed_count < self._nmea_send_failed_max or attempt > 0:
+          return
         self._logwarn("NMEA sentence failed to send to server {} times, restarting".format(self._nmea_send_failed_count))
         self.reconnect()
         self._nmea_send_failed_count = 0
-        self.send_nmea(sentence)  # Try sending the NMEA sentence again
 
 
   def recv_rtcm(self):
@@ -241,25 +266,29 @@ class NTRIPClient:
       return []
     
     # If it has been too long since we received an RTCM packet, reconnect
-    if time.time() - self.rtcm_timeout_seconds >= self._recv_rtcm_last_packet_timestamp and self._first_rtcm_received:
+    # Use a monotonic clock so this is not thrown off if the system time is changed
+    now_ns = time.monotonic_ns()
+    if self._first_rtcm_received and now_ns - self._recv_rtcm_last_packet_ns >= self.rtcm_timeout_seconds * 1000000000:
       self._logerr('RTCM data not received for {} seconds, reconnecting'.format(self.rtcm_timeout_seconds))
       self.reconnect()
       self._first_rtcm_received = False
+      now_ns = time.monotonic_ns()  # reconnecting can take a while
 
-    # Check if there is any data available on the socket
-    read_sockets, _, _ = select.select([self._server_socket], [], [], 0)
-    if not read_sockets:
-      return []
-
-    # Since we only ever pass the server socket to the list of read sockets, we can just read from that
-    # Read all available data into a buffer
-    data = b''
+    # Read all available data into a buffer. The socket is non blocking, so we know there is no more data when the read would block
+    data_length = 0
+    would_block = False
+    recv_into = self._server_socket.recv_into
     while True:
       try:
-        chunk = self._server_socket.recv(_CHUNK_SIZE)
-        data += chunk
-        if len(chunk) < _CHUNK_SIZE:
+        if data_length + _CHUNK_SIZE > len(self._recv_buffer):
+          self._grow_recv_buffer(data_length)
+        chunk_length = recv_into(self._recv_buffer_view[data_length:data_length + _CHUNK_SIZE])
+        data_length += chunk_length
+        if chunk_length == 0:
           break
+      except (BlockingIOError, ssl.SSLWantReadError, ssl.SSLWantWriteError):
+        would_block = True
+        break  # no more data is available right now, so nothing to worry about
       except Exception as e:
         self._logerr('Error while reading {} bytes from socket'.format(_CHUNK_SIZE))
         if not self._socket_is_open():
@@ -267,20 +296,26 @@ class NTRIPClient:
           self.reconnect()
           return []
         break
+
+    # Nothing was available on the socket
+    if data_length == 0 and would_block:
+      return []
+
+    data = bytes(self._recv_buffer_view[:data_length])
     self._logdebug('Read {} bytes'.format(len(data)))
 
-    # If 0 bytes were read from the socket even though we were told data is available multiple times,
+    # If 0 bytes were read from the socket even though the read did not block multiple times,
     # it can be safely assumed that we can reconnect as the server has closed the connection
     if len(data) == 0:
       self._read_zero_bytes_count += 1
       if self._read_zero_bytes_count >= self._read_zero_bytes_max:
-        self._logwarn('Reconnecting because we received 0 bytes from the socket even though it said there was data available {} times'.format(self._read_zero_bytes_count))
+        self._logwarn('Reconnecting because we received 0 bytes from the socket even though the read did not block {} times'.format(self._read_zero_bytes_count))
         self.reconnect()
         self._read_zero_bytes_count = 0
         return []
     else:
       # Looks like we received valid data, so note when the data was received
-      self._recv_rtcm_last_packet_timestamp = time.time()
+      self._recv_rtcm_last_packet_ns = now_ns
       self._first_rtcm_received = True
 
     # Send the data to the RTCM parser to parse it
@@ -304,6 +339,14 @@ class NTRIPClient:
     request_str += '\r\n'
     return request_str.encode('utf-8')
   
+  def _grow_recv_buffer(self, data_length):
+    # The view holds onto the old buffer so it can't be resized in place, copy what we have read so far into a bigger one
+    self._logdebug('Growing receive buffer to {} bytes'.format(len(self._recv_buffer) * 2))
+    recv_buffer = bytearray(len(self._recv_buffer) * 2)
+    recv_buffer[:data_length] = self._recv_buffer_view[:data_length]
+    self._recv_buffer = recv_buffer
+    self._recv_buffer_view = memoryview(self._recv_buffer)
+
   def _socket_is_open(self):
     try:
       # this will try to read bytes without blocking and also without removing them from buffer (peek only)
@@ -48,19 +48,19 @@ class RTCMParser:
     self._loginfo = loginfo
     self._logdebug = logdebug
 
-    # Empty buffer, will be filled out
-    self._caching_data = False
+    # Incomplete packet left over from the last call to parse, will be filled out
     self._buffer = b''
 
   def parse(self, buffer):
-    # Add any data that we have cached
-    if self._caching_data:
+    # Add the incomplete packet that we cached last time, if there was one
+    if self._buffer:
       combined_buffer = self._buffer + buffer
     else:
       combined_buffer = buffer
 
     # Loop over the passed buffer, and parse all available RTCM packets
     index = 0
+    incomplete_index = None
     rtcm_packets = []
     while index < len(combined_buffer):
       # Find the start of the RTCM 3.2 packet
@@ -68,8 +68,8 @@ class RTCMParser:
         # Make sure we have enough data to find the length
         if len(combined_buffer) <= index + 2:
           self._logdebug('Found beginning of RTCM packet at {}, but there is not enough data in the buffer to find the message length'.format(index))
-          self._caching_data = True
-          buffer = buffer[index:]
+          if incomplete_index is None:
+            incomplete_index = index
           break
 
         # Make sure we have enough data in the packet to validate it
@@ -84,9 +84,8 @@ class RTCMParser:
             rtcm_packets.append(packet)
             index += message_length + 6
 
-            # Remove the packet we just found from the cached buffer
-            self._caching_data = False
-            self._buffer = self._buffer[message_length + 5:]
+            # Any incomplete packet we found before this one overlaps it, so it was not actually the start of a packet
+            incomplete_index = None
             continue
           else:
             self._logwarn('Found packet, but checksums didn\'t match')
@@ -94,19 +93,22 @@ class RTCMParser:
             self._logwarn('Actual Checksum:   0x{:X}'.format(actual_checksum))
         else:
           self._logdebug('Found beginning of RTCM packet at {}, but there is not enough data in the buffer to extract it, caching'.format(index))
-          self._caching_data = True
+          if incomplete_index is None:
+            incomplete_index = index
 
       # If we didn't find a message, manually move on to the next byte
       index += 1
 
-    # If we didn't find a full packet, cache this one for next time
-    if self._caching_data:
-      self._buffer += buffer
+    # If we didn't find a full packet, cache only the incomplete packet at the end of the buffer for next time
+    if incomplete_index is not None:
+      self._buffer = combined_buffer[incomplete_index:]
 
       # Throw away old data if we are at our limit
       if len(self._buffer) > _MAX_BUFFER_SIZE:
         self._logwarn("Too much data buffered, trimming to {} bytes.".format(_MAX_BUFFER_SIZE))
         self._buffer = self._buffer[:_MAX_BUFFER_SIZE]
+    else:
+      self._buffer = b''
 
     # Return the RTCM packets we found
     return rtcm_packets